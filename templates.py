@@ -0,0 +1,242 @@
+"""
+Template (pattern-overlay) solver.
+
+A template is one valid placement of a single digit across the whole board:
+one box in every row, column and square (and on each diagonal for the
+diagonal variant). Each template is stored as an 81-bit integer where bit i
+is set when boxes[i] holds the digit. Solving a puzzle means picking nine
+mutually disjoint templates, one per digit, that agree with the givens.
+"""
+
+import os
+import pickle
+
+from solution import boxes, rows, cols, square_units, diagonal_units, grid_values
+
+TEMPLATE_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates.pickle')
+
+# Number of templates in a correct table for each variant
+TEMPLATE_COUNTS = {False: 46656, True: 9288}
+
+_templates = {}
+_index = {}
+
+
+bit = dict((box, 1 << i) for i, box in enumerate(boxes))
+
+
+def unit_mask(unit):
+    "Bitmask with the bits of every box in the unit set."
+    return sum(bit[box] for box in unit)
+
+square_of = dict((box, i) for i, unit in enumerate(square_units) for box in unit)
+diagonal_masks = [unit_mask(unit) for unit in diagonal_units]
+
+
+def build_templates(diagonal):
+    """
+    Enumerate every placement of a single digit on the board.
+    Args:
+        diagonal(bool): also require exactly one box on each main diagonal.
+    Returns:
+        A list of templates as 81-bit integers (46656 for standard Sudoku).
+    """
+    templates = []
+
+    def place(r, mask, used_cols, used_squares):
+        if r == len(rows):
+            templates.append(mask)
+            return
+        for c, col in enumerate(cols):
+            box = rows[r] + col
+            square = square_of[box]
+            if used_cols & (1 << c) or used_squares & (1 << square):
+                continue
+            place(r + 1, mask | bit[box], used_cols | (1 << c), used_squares | (1 << square))
+
+    place(0, 0, 0, 0)
+    if diagonal:
+        templates = [t for t in templates if all(bin(t & m).count('1') == 1 for m in diagonal_masks)]
+    return templates
+
+
+def valid_templates(templates, diagonal):
+    "Check that a table read back from the cache is complete and well formed."
+    return (isinstance(templates, list) and len(templates) == TEMPLATE_COUNTS[diagonal]
+            and all(isinstance(t, int) and bin(t).count('1') == len(rows) for t in templates))
+
+
+def load_templates(diagonal, path=TEMPLATE_CACHE):
+    """
+    Return the templates for a variant, building them once and caching them on disk.
+    Args:
+        diagonal(bool): whether the diagonal units apply.
+        path(string): location of the on-disk cache.
+    Returns:
+        The list of templates for the variant.
+    """
+    if diagonal in _templates:
+        return _templates[diagonal]
+    try:
+        with open(path, 'rb') as f:
+            cache = pickle.load(f)
+    except Exception:
+        cache = {} # Missing or unreadable cache: rebuild the tables
+    if not isinstance(cache, dict):
+        cache = {}
+    # Drop anything stale, truncated or edited rather than solve with it
+    cache = dict((k, v) for k, v in cache.items() if k in TEMPLATE_COUNTS and valid_templates(v, k))
+    if diagonal not in cache:
+        cache[diagonal] = build_templates(diagonal)
+        try:
+            with open(path, 'wb') as f:
+                pickle.dump(cache, f)
+        except OSError:
+            pass # A read-only checkout just rebuilds the tables next run
+    _templates.update(cache)
+    return _templates[diagonal]
+
+
+def template_index(diagonal):
+    """
+    Return, for each box, the set of templates of a variant that cover it.
+    Args:
+        diagonal(bool): whether the diagonal units apply.
+    Returns:
+        A list of 81 integers, in the same order as boxes, where bit k is set
+        when the k-th template of load_templates(diagonal) covers the box.
+    """
+    if diagonal not in _index:
+        templates = load_templates(diagonal)
+        covers = [bytearray((len(templates) + 7) // 8) for box in boxes]
+        for k, t in enumerate(templates):
+            while t:
+                low = t & -t
+                covers[low.bit_length() - 1][k >> 3] |= 1 << (k & 7)
+                t ^= low
+        _index[diagonal] = [int.from_bytes(c, 'little') for c in covers]
+    return _index[diagonal]
+
+
+def candidates(values, templates, index):
+    """
+    Filter the templates of every digit against the givens.
+    Args:
+        values(dict): The sudoku in dictionary form, as returned by grid_values.
+        templates(list): templates for the variant being solved.
+        index(list): template sets per box, as returned by template_index.
+    Returns:
+        A dict of {digit: [template, ...]} holding the templates that cover every
+        box given as that digit and no box given as another digit.
+    """
+    everything = (1 << len(templates)) - 1
+    required = dict((d, everything) for d in cols)
+    touched = dict((d, 0) for d in cols)
+    for i, box in enumerate(boxes):
+        if len(values[box]) == 1:
+            required[values[box]] &= index[i]
+            touched[values[box]] |= index[i]
+    options = {}
+    for d in cols:
+        keep = required[d]
+        for other in cols:
+            if other != d:
+                keep &= ~touched[other]
+        # Reversed, character k of the binary string is bit k, i.e. templates[k]
+        bits = bin(keep)[:1:-1]
+        options[d] = []
+        k = bits.find('1')
+        while k != -1:
+            options[d].append(templates[k])
+            k = bits.find('1', k + 1)
+    return options
+
+
+def search(options, used):
+    "Using depth-first search, combine one disjoint template per digit."
+    if not options:
+        return {}
+    # Every box left open must still be reachable by some remaining template
+    reachable = 0
+    for ts in options.values():
+        for t in ts:
+            reachable |= t
+    if reachable | used != (1 << len(boxes)) - 1:
+        return False
+    # Choose the digit with the fewest templates left
+    n, d = min((len(ts), d) for d, ts in options.items())
+    for t in options[d]:
+        remaining = {}
+        for other, ts in options.items():
+            if other == d:
+                continue
+            remaining[other] = [u for u in ts if not u & t]
+            if not remaining[other]:
+                break
+        else:
+            attempt = search(remaining, used | t)
+            if attempt is not False:
+                attempt[d] = t
+                return attempt
+    return False
+
+
+def solve(grid, diagonal=True):
+    """
+    Find the solution to a Sudoku grid by overlaying digit templates.
+    Args:
+        grid(string): a string representing a sudoku grid.
+            Example: '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+        diagonal(bool): whether the diagonal units apply, as they do in solution.solve.
+    Returns:
+        The dictionary representation of the final sudoku grid. False if no solution exists.
+    """
+    options = candidates(grid_values(grid), load_templates(diagonal), template_index(diagonal))
+    chosen = search(options, 0)
+    if chosen is False:
+        return False
+    return dict((box, d) for d, t in chosen.items() for i, box in enumerate(boxes) if t >> i & 1)
+
+
+def benchmark(grids, repeat=3):
+    """
+    Time this engine against the propagation search in solution.py.
+    Args:
+        grids(list): (name, grid, diagonal) tuples to solve.
+        repeat(int): number of runs per grid; the best time is reported.
+    """
+    import timeit
+    import solution
+    from solution import unitlist, units, peers
+
+    def standard_units():
+        "Swap the diagonal units out of solution.py's module-level tables."
+        standard = [u for u in unitlist if u not in diagonal_units]
+        solution.unitlist = standard
+        solution.units = dict((s, [u for u in standard if s in u]) for s in boxes)
+        solution.peers = dict((s, set(sum(solution.units[s], [])) - set([s])) for s in boxes)
+
+    template_index(False)
+    template_index(True)
+    print('{:<12}{:>10}{:>14}{:>14}'.format('grid', 'variant', 'search (ms)', 'template (ms)'))
+    for name, grid, diagonal in grids:
+        if not diagonal:
+            standard_units()
+        try:
+            expected = solution.solve(grid)
+            t_search = min(timeit.repeat(lambda: solution.solve(grid), number=1, repeat=repeat))
+        finally:
+            solution.unitlist, solution.units, solution.peers = unitlist, units, peers
+        assert solve(grid, diagonal) == expected
+        t_template = min(timeit.repeat(lambda: solve(grid, diagonal), number=1, repeat=repeat))
+        print('{:<12}{:>10}{:>14.2f}{:>14.2f}'.format(
+            name, 'diagonal' if diagonal else 'standard', t_search * 1000, t_template * 1000))
+
+
+if __name__ == '__main__':
+    benchmark([
+        ('diag-1', '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3', True),
+        ('diag-2', '....2.7........5..14..........6.7...8.......4...1.8..........52..8........3.7....', True),
+        ('hard', '....1.8..8..6...5.45.9.3.7....3...9.9.7...4.3.3...1....1.8.4.65.4...6..1..6.7....', False),
+        ('easy', '..3.2.6..9..3.5..1..18.64....81.29..7.......8..67.82....26.95..8..2.3..9..5.1.3..', False),
+    ])
@@ -0,0 +1,86 @@
+import os
+import pickle
+import shutil
+import tempfile
+import templates
+import solution
+import solution_test
+import unittest
+
+
+class TemplateCacheTestCase(unittest.TestCase):
+    "Keep the template tables in a scratch cache instead of the checkout."
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.cache_dir, 'templates.pickle')
+        templates._templates.clear()
+        templates._index.clear()
+
+    def tearDown(self):
+        templates._templates.clear()
+        templates._index.clear()
+        shutil.rmtree(self.cache_dir)
+
+
+class TestTemplates(TemplateCacheTestCase):
+    def test_template_counts(self):
+        self.assertEqual(len(templates.build_templates(False)), 46656)
+        self.assertEqual(len(templates.build_templates(True)), 9288)
+
+    def test_diagonal_templates(self):
+        for t in templates.load_templates(True, self.path):
+            self.assertEqual(bin(t).count('1'), 9)
+            for mask in templates.diagonal_masks:
+                self.assertEqual(bin(t & mask).count('1'), 1)
+
+
+class TestTemplateCache(TemplateCacheTestCase):
+    def test_cache_written_and_reloaded(self):
+        built = templates.load_templates(True, self.path)
+        self.assertTrue(os.path.exists(self.path))
+        templates._templates.clear()
+        build_templates = templates.build_templates
+        templates.build_templates = None # Fail loudly if the cache is not used
+        try:
+            self.assertEqual(templates.load_templates(True, self.path), built)
+        finally:
+            templates.build_templates = build_templates
+
+    def test_corrupt_cache(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\x80\x04not a pickle')
+        self.assertEqual(len(templates.load_templates(True, self.path)), 9288)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(len(pickle.load(f)[True]), 9288)
+
+    def test_invalid_cache(self):
+        with open(self.path, 'wb') as f:
+            pickle.dump({False: [1, 2]}, f)
+        self.assertEqual(len(templates.load_templates(False, self.path)), 46656)
+        self.assertTrue(templates.solve('.' * 81, diagonal=False))
+
+
+class TestTemplateSolve(TemplateCacheTestCase):
+    def setUp(self):
+        super(TestTemplateSolve, self).setUp()
+        templates.load_templates(False, self.path)
+        templates.load_templates(True, self.path)
+
+    def test_solve(self):
+        self.assertEqual(templates.solve(solution_test.TestDiagonalSudoku.diagonal_grid),
+                         solution_test.TestDiagonalSudoku.solved_diag_sudoku)
+
+    def test_solve_standard(self):
+        grid = '....1.8..8..6...5.45.9.3.7....3...9.9.7...4.3.3...1....1.8.4.65.4...6..1..6.7....'
+        values = templates.solve(grid, diagonal=False)
+        for box, given in solution.grid_values(grid).items():
+            if len(given) == 1:
+                self.assertEqual(values[box], given)
+        for unit in solution.row_units + solution.column_units + solution.square_units:
+            self.assertEqual(sorted(values[box] for box in unit), list('123456789'))
+
+    def test_no_solution(self):
+        self.assertFalse(templates.solve('11' + '.' * 79))
+
+if __name__ == '__main__':
+    unittest.main()